@@ -8,18 +8,65 @@ from __future__ import annotations
 
 import sys
 import os
+import io
+import shutil
 import signal
 import subprocess
 import logging
+from logging.handlers import MemoryHandler, RotatingFileHandler
+import collections
+import threading
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
 from pathlib import Path
-from typing import List, Iterable, Optional, Tuple
+from typing import Callable, Collection, Deque, Dict, List, Iterable, Optional, Set, Tuple
 import click
 import glob
+import fnmatch
+import re
+import json
+import functools
 
 IMAGE_FORMATS = {"jpg","jpeg","png","webp","bmp"}
 VIDEO_FORMATS = {"mp4","mkv","mov","avi","webm"}
 AUDIO_FORMATS = {"mp3","wav","aac","flac","ogg"}
 
+# Encoder pair (video, audio) used when re-encoding into each container.
+VIDEO_CODECS = {
+    "mp4": ("libx264", "aac"),
+    "mov": ("libx264", "aac"),
+    "mkv": ("libx264", "aac"),
+    "avi": ("libx264", "libmp3lame"),
+    "webm": ("libvpx-vp9", "libopus"),
+}
+
+# JPEG -q:v (2 = best, 31 = worst) for each --quality value 0..100.
+_Q_MAP = tuple(max(2, min(31, (100 - q) // 3)) for q in range(101))
+
+# Codecs each container can hold as-is, per stream type; None accepts any
+# codec of that type, and a missing type (e.g. data streams) cannot be copied.
+COPY_CODECS = {
+    "mp4": {
+        "video": {"h264", "hevc", "av1", "mpeg4"},
+        "audio": {"aac", "mp3", "ac3", "alac"},
+        "subtitle": {"mov_text"},
+    },
+    "mov": {
+        "video": {"h264", "hevc", "mpeg4", "prores"},
+        "audio": {"aac", "mp3", "ac3", "alac"},
+        "subtitle": {"mov_text"},
+    },
+    "mkv": {"video": None, "audio": None, "subtitle": None, "attachment": None},
+    "webm": {
+        "video": {"vp8", "vp9", "av1"},
+        "audio": {"opus", "vorbis"},
+        "subtitle": {"webvtt"},
+    },
+    "avi": {
+        "video": {"h264", "mpeg4", "mjpeg"},
+        "audio": {"mp3", "ac3", "pcm_s16le"},
+    },
+}
+
 # ============================================================
 # Version
 # ============================================================
@@ -31,24 +78,56 @@ APP_VERSION: str = "1.1.0"
 # ============================================================
 
 CREATED_FILES: List[Path] = []
+# Re-entrant because the SIGINT handler runs on the main thread, which may
+# already hold the lock when the signal lands.
+CREATED_FILES_LOCK = threading.RLock()
+
+# Set by the interrupt handler; no FFmpeg is launched once it is set.
+STOP_EVENT = threading.Event()
+# Live FFmpeg children and outputs of jobs still running, so an interrupt
+# can stop them and remove what they were writing. Guarded by CREATED_FILES_LOCK.
+_RUNNING: Set[subprocess.Popen] = set()
+_IN_FLIGHT: Set[Path] = set()
 LOG_FILE: Path = Path("avicore.log")
+CACHE_DIR: Path = Path(os.environ.get("XDG_CACHE_HOME") or Path.home() / ".cache") / "avicore"
+VERIFY_CACHE: Path = CACHE_DIR / "ffmpeg_verify.json"
+
+# Admission control for FFmpeg subprocesses; resized from --max-parallel in cli().
+DEFAULT_MAX_PARALLEL: int = max(1, (os.cpu_count() or 1) // 2)
+_FFMPEG_SEM = threading.BoundedSemaphore(DEFAULT_MAX_PARALLEL)
 
 # ============================================================
 # Logging
 # ============================================================
 
 def setup_logging(verbose: bool) -> None:
-    logging.basicConfig(
-        filename=str(LOG_FILE),
-        level=logging.DEBUG if verbose else logging.WARNING,
-        format="%(asctime)s | %(levelname)s | %(message)s",
-        filemode="a",
+    root = logging.getLogger()
+    if root.handlers:
+        return
+
+    # delay=True: the file is only created once something is logged.
+    # Rotation bounds disk use under --verbose, where FFmpeg output is forwarded.
+    file_handler = RotatingFileHandler(
+        str(LOG_FILE),
+        maxBytes=10_000_000,
+        backupCount=3,
+        delay=True,
+        encoding="utf-8",
     )
+    file_handler.setFormatter(logging.Formatter("%(asctime)s | %(levelname)s | %(message)s"))
+
+    # Buffer records and write them in batches; errors flush immediately,
+    # and logging.shutdown() flushes the rest at exit.
+    buffered = MemoryHandler(capacity=512, flushLevel=logging.ERROR, target=file_handler)
+
+    root.addHandler(buffered)
+    root.setLevel(logging.DEBUG if verbose else logging.WARNING)
 
 # ============================================================
 # FFmpeg Resolution & Verification
 # ============================================================
 
+@functools.lru_cache(maxsize=1)
 def resolve_ffmpeg() -> Path:
     # Add the .exe extension if we are on Windows
     ext = ".exe" if os.name == "nt" else ""
@@ -63,12 +142,52 @@ def resolve_ffmpeg() -> Path:
     return candidate
 
 
+@functools.lru_cache(maxsize=1)
+def resolve_ffprobe(ffmpeg: Path) -> Optional[Path]:
+    # Optional: only used for progress/metadata, so its absence is not an error.
+    candidate = ffmpeg.with_name(ffmpeg.name.replace("ffmpeg", "ffprobe", 1))
+    return candidate if candidate.exists() else None
+
+
+def _verify_key(ffmpeg: Path) -> str:
+    # A bundled build unpacks FFmpeg into a new temp dir on every run, so
+    # key on the frozen executable itself, which is stable between runs.
+    if getattr(sys, "frozen", False) or hasattr(sys, "_MEIPASS"):
+        ffmpeg = Path(sys.executable)
+    st = ffmpeg.stat()
+    return f"{ffmpeg.resolve()}|{st.st_mtime_ns}|{st.st_size}"
+
+
+def _load_verify_cache() -> dict:
+    try:
+        data = json.loads(VERIFY_CACHE.read_text(encoding="utf-8"))
+    except (OSError, ValueError):
+        return {}
+    return data if isinstance(data, dict) else {}
+
+
+def _store_verify_cache(key: str) -> None:
+    # Best effort; a single entry, so the file never grows.
+    try:
+        CACHE_DIR.mkdir(parents=True, exist_ok=True)
+        VERIFY_CACHE.write_text(json.dumps({key: "ok"}), encoding="utf-8")
+    except OSError:
+        logging.debug("Could not write %s", VERIFY_CACHE, exc_info=True)
+
+
+# Process-local memo on top of the on-disk cache; failures raise and are not cached.
+@functools.lru_cache(maxsize=None)
 def verify_ffmpeg(ffmpeg: Path) -> None:
     if not ffmpeg.exists():
         raise click.ClickException(
             f"FFmpeg not found.\nExpected location: {ffmpeg.resolve()}"
         )
 
+    # Same binary (path, mtime, size) already passed the self-diagnostic.
+    key = _verify_key(ffmpeg)
+    if _load_verify_cache().get(key) == "ok":
+        return
+
     try:
         result = subprocess.run(
             [str(ffmpeg), "-version"],
@@ -85,6 +204,8 @@ def verify_ffmpeg(ffmpeg: Path) -> None:
             f"Reason: {exc}"
         )
 
+    _store_verify_cache(key)
+
 # ============================================================
 # Safety & Cleanup
 # ============================================================
@@ -92,10 +213,26 @@ def verify_ffmpeg(ffmpeg: Path) -> None:
 def register_cleanup() -> None:
     def _handler(sig, frame=None):
         click.secho("\nInterrupted. Cleaning up partial outputs…", fg="yellow")
-        for f in CREATED_FILES:
+
+        # Stop launches and drain in one locked step: once a child is stopped its
+        # worker drops its outputs from _IN_FLIGHT, so they must be taken first.
+        # Queued pool jobs are cancelled by run_batch as the exit unwinds.
+        with CREATED_FILES_LOCK:
+            STOP_EVENT.set()
+            running = list(_RUNNING)
+            pending = CREATED_FILES[:] + list(_IN_FLIGHT)
+            CREATED_FILES.clear()
+            _IN_FLIGHT.clear()
+
+        # Stop running FFmpeg before unlinking, so nothing is written afterwards.
+        for proc in running:
+            _stop_process(proc)
+
+        for f in pending:
             try:
-                if f.exists():
-                    f.unlink()
+                os.unlink(f)
+            except FileNotFoundError:
+                pass
             except Exception:
                 logging.exception("Cleanup failed")
         sys.exit(130)
@@ -104,15 +241,66 @@ def register_cleanup() -> None:
     signal.signal(signal.SIGTERM, _handler)
 
 
+def _stop_process(proc: subprocess.Popen, timeout: float = 5.0) -> None:
+    try:
+        proc.terminate()
+        proc.wait(timeout=timeout)
+    except subprocess.TimeoutExpired:
+        proc.kill()
+        proc.wait()
+    except OSError:
+        pass
+
+
+def track_created(*paths: Path) -> None:
+    with CREATED_FILES_LOCK:
+        CREATED_FILES.extend(paths)
+
+
+# Per-run snapshot of directory listings (normcased names). Seeded for free
+# by the input scan, then used by the planning-phase existence checks, so a
+# batch costs one readdir per directory instead of a stat per file.
+_DIR_NAMES: Dict[Path, Set[str]] = {}
+
 
-def suggest_path(path: Path) -> Path:
+def _existing_names(directory: Path) -> Set[str]:
+    names = _DIR_NAMES.get(directory)
+    if names is None:
+        try:
+            with os.scandir(directory) as it:
+                names = {os.path.normcase(e.name) for e in it}
+        except OSError:
+            return set()
+        _DIR_NAMES[directory] = names
+    return names
+
+
+def _index_update(added: Iterable[Path] = (), removed: Iterable[Path] = ()) -> None:
+    # Keep snapshots in step with files we create or remove ourselves.
+    for p in added:
+        if p.parent in _DIR_NAMES:
+            _DIR_NAMES[p.parent].add(os.path.normcase(p.name))
+    for p in removed:
+        if p.parent in _DIR_NAMES:
+            _DIR_NAMES[p.parent].discard(os.path.normcase(p.name))
+
+
+def path_exists(path: Path) -> bool:
+    names = _DIR_NAMES.get(path.parent)
+    if names is None:
+        return path.exists()
+    return os.path.normcase(path.name) in names
+
+
+def suggest_path(path: Path, reserved: Collection[Path] = ()) -> Path:
     base = path.stem
     suffix = path.suffix
     parent = path.parent
+    existing = _existing_names(parent)
     idx = 1
     while True:
         candidate = parent / f"{base}_{idx}{suffix}"
-        if not candidate.exists():
+        if os.path.normcase(candidate.name) not in existing and candidate not in reserved:
             return candidate
         idx += 1
 
@@ -122,12 +310,26 @@ def backup_original(src: Path) -> Path:
 
     target = backup_dir / src.name
 
+    taken = _existing_names(backup_dir)
     counter = 1
-    while target.exists():
+    while os.path.normcase(target.name) in taken:
         target = backup_dir / f"{src.stem}_{counter}{src.suffix}"
         counter += 1
 
-    src.rename(target)
+    # Link first so the data always has a name on disk; copy whenever
+    # linking fails (other filesystem, FAT/exFAT, SMB shares, sandboxes
+    # all report it differently) unless the name was taken meanwhile.
+    try:
+        os.link(src, target)
+    except FileExistsError:
+        raise
+    except OSError:
+        shutil.copy2(src, target)
+        with open(target, "rb+") as fh:
+            os.fsync(fh.fileno())
+
+    os.unlink(src)
+    _index_update(added=[target], removed=[src])
     return target
 
 
@@ -136,23 +338,95 @@ def backup_original(src: Path) -> Path:
 # Subprocess Wrapper
 # ============================================================
 
-def run_ffmpeg(cmd: List[str], dry_run: bool = False) -> bool:
+def _lower_priority(pid: int, increment: int = 10) -> None:
+    try:
+        niceness = os.getpriority(os.PRIO_PROCESS, 0) + increment
+        os.setpriority(os.PRIO_PROCESS, pid, min(19, niceness))
+    except OSError:
+        logging.debug("Could not renice pid %s", pid, exc_info=True)
+
+
+# Keys FFmpeg writes for "-progress"; kept out of the debug log.
+PROGRESS_KEYS = {
+    "frame", "fps", "bitrate", "total_size", "out_time_us", "out_time_ms",
+    "out_time", "dup_frames", "drop_frames", "speed", "progress",
+}
+
+
+def run_ffmpeg(cmd: List[str], dry_run: bool = False,
+               on_progress: Optional[Callable[[int], None]] = None) -> bool:
+    """
+    Run FFmpeg. If on_progress is given, it is called with the current
+    output position in milliseconds as FFmpeg reports it.
+    """
+    # FFmpeg gets no stdin (see below), so it could not answer its own
+    # overwrite prompt; callers have already skipped or renamed existing
+    # outputs unless --force asked to replace them.
+    cmd = [cmd[0], "-y", *cmd[1:]]
+    if on_progress is not None:
+        cmd = [cmd[0], "-progress", "pipe:2", "-nostats", *cmd[1:]]
+
     logging.debug("FFmpeg cmd: %s", " ".join(cmd))
 
     if dry_run:
         click.secho("[DRY-RUN] " + " ".join(cmd), fg="cyan")
         return True
 
+    # Run transcodes at reduced priority so they don't starve interactive work.
+    # On POSIX the child is reniced after launch: a preexec_fn would force the
+    # slow fork+exec path instead of posix_spawn, as would close_fds=True.
+    if os.name == "nt":
+        spawn = dict(creationflags=subprocess.BELOW_NORMAL_PRIORITY_CLASS, close_fds=True)
+    else:
+        spawn = dict(close_fds=False)
+
     try:
-        result = subprocess.run(
-            cmd,
-            stdout=subprocess.PIPE,
-            stderr=subprocess.PIPE,
-            text=True,
-        )
+        with _FFMPEG_SEM:
+            # Launch and register atomically with the stop check, so the
+            # interrupt handler either sees this child or prevents it.
+            with CREATED_FILES_LOCK:
+                if STOP_EVENT.is_set():
+                    return False
+                # No stdin: concurrent FFmpegs would each switch the terminal
+                # to raw mode and race for keystrokes. DEVNULL keeps posix_spawn.
+                proc = subprocess.Popen(
+                    cmd,
+                    stdin=subprocess.DEVNULL,
+                    stdout=subprocess.DEVNULL,
+                    stderr=subprocess.PIPE,
+                    text=True,
+                    errors="replace",
+                    bufsize=1,
+                    **spawn,
+                )
+                _RUNNING.add(proc)
+
+            if os.name != "nt":
+                _lower_priority(proc.pid)
+
+            # Stream stderr line by line; keep only a bounded tail (~64KB) for the error report.
+            tail: Deque[str] = collections.deque(maxlen=512)
+            try:
+                with proc:
+                    for line in proc.stderr:
+                        key, sep, value = line.rstrip().partition("=")
+                        if sep and (key in PROGRESS_KEYS or key.startswith("stream_")):
+                            # out_time_ms is in microseconds despite its name.
+                            if key == "out_time_ms" and on_progress is not None and value.isdigit():
+                                on_progress(int(value) // 1000)
+                            continue
+                        logging.debug(line.rstrip())
+                        tail.append(line)
+                    returncode = proc.wait()
+            finally:
+                with CREATED_FILES_LOCK:
+                    _RUNNING.discard(proc)
+
+        if returncode != 0 and STOP_EVENT.is_set():
+            return False
 
-        if result.returncode != 0:
-            logging.error(result.stderr)
+        if returncode != 0:
+            logging.error("".join(tail))
             click.secho("FFmpeg failed. See avicore.log for details.", fg="red")
             return False
 
@@ -163,23 +437,351 @@ def run_ffmpeg(cmd: List[str], dry_run: bool = False) -> bool:
         click.secho(f"Execution error: {exc}", fg="red")
         return False
 
+# ============================================================
+# Media Probing
+# ============================================================
+
+@functools.lru_cache(maxsize=4096)
+def _probe_cached(ffprobe: str, path: str, mtime_ns: int, size: int) -> Optional[dict]:
+    # (mtime_ns, size) are part of the key so a rewritten file is re-probed.
+    try:
+        result = subprocess.run(
+            [ffprobe, "-v", "error",
+             "-show_format", "-show_streams",
+             "-of", "json", path],
+            stdout=subprocess.PIPE,
+            stderr=subprocess.PIPE,
+            text=True,
+        )
+        if result.returncode != 0:
+            raise RuntimeError(result.stderr.strip())
+        return json.loads(result.stdout)
+    except (OSError, ValueError, RuntimeError):
+        logging.debug("Probe failed: %s", path, exc_info=True)
+        return None
+
+
+def probe(ffprobe: Path, src: Path) -> Optional[dict]:
+    """
+    Parsed "ffprobe -show_format -show_streams" JSON for src, or None.
+    Every decision that needs metadata goes through here, so each file is
+    probed at most once per run.
+    """
+    try:
+        st = src.stat()
+    except OSError:
+        return None
+    return _probe_cached(str(ffprobe), str(src), st.st_mtime_ns, st.st_size)
+
+
+def probe_duration_ms(ffprobe: Path, src: Path) -> Optional[int]:
+    info = probe(ffprobe, src)
+    try:
+        return int(float(info["format"]["duration"]) * 1000)
+    except (TypeError, KeyError, ValueError):
+        return None
+
+
+def _probe_codecs(ffprobe: Path, src: Path) -> Optional[List[Tuple[Optional[str], Optional[str]]]]:
+    """(codec type, codec name) of every stream; None if probing fails."""
+    info = probe(ffprobe, src)
+    if info is None:
+        return None
+
+    return [
+        (stream.get("codec_type"), stream.get("codec_name"))
+        for stream in info.get("streams", [])
+    ]
+
+
+def can_stream_copy(ffprobe: Optional[Path], src: Path, fmt: str) -> bool:
+    """
+    True if "-map 0 -c copy" into fmt will work: every stream -map 0
+    selects (subtitles, attachments and data included) must be a type and
+    codec the target container accepts.
+    """
+    if ffprobe is None or fmt not in COPY_CODECS:
+        return False
+
+    streams = _probe_codecs(ffprobe, src)
+    if streams is None:
+        return False
+
+    accepted = COPY_CODECS[fmt]
+    for kind, codec in streams:
+        if kind not in accepted:
+            return False
+        allowed = accepted[kind]
+        if allowed is not None and codec not in allowed:
+            return False
+    return True
+
+# ============================================================
+# Batch Execution
+# ============================================================
+
+# (sources, outputs, cmd) — one independent FFmpeg invocation.
+Job = Tuple[List[Path], List[Path], List[str]]
+
+# (src, [(dst, output options), ...]) — what to make from one source.
+ImagePlan = Tuple[Path, List[Tuple[Path, List[str]]]]
+
+# Sources per FFmpeg process in image --batch mode; keeps argv well
+# under the Windows command-line limit and bounds open inputs.
+BATCH_SIZE: int = 64
+
+
+def default_jobs(threads: Optional[int], max_parallel: int) -> int:
+    if threads:
+        return max(1, (os.cpu_count() or 1) // threads)
+    return max_parallel
+
+
+def thread_args(ctx: click.Context, job_count: int) -> List[str]:
+    """
+    FFmpeg "-threads" for one of job_count planned jobs: the explicit
+    --threads value, otherwise the CPUs split across the jobs that will
+    actually run at once ("0" = FFmpeg auto when a single job has the
+    whole machine).
+    """
+    n = ctx.obj["threads"]
+    if not n:
+        concurrent = min(ctx.obj["jobs"], ctx.obj["max_parallel"], max(1, job_count))
+        n = 0 if concurrent == 1 else max(1, (os.cpu_count() or 1) // concurrent)
+    return ["-threads", str(n)]
+
+
+def build_image_jobs(ctx: click.Context, plan: List[ImagePlan], batch: bool = False) -> List[Job]:
+    """
+    One FFmpeg per source, or with batch=True one FFmpeg per BATCH_SIZE
+    sources: every source is a separate input mapped to its own outputs,
+    so each image keeps its own size and lands directly at its final name.
+    """
+    ffmpeg: str = ctx.obj["ffmpeg_s"]
+    size = BATCH_SIZE if batch else 1
+    threads = thread_args(ctx, -(-len(plan) // size))
+    jobs: List[Job] = []
+
+    for start in range(0, len(plan), size):
+        chunk = plan[start:start + size]
+        cmd = [ffmpeg]
+        for src, _ in chunk:
+            cmd += ["-i", str(src)]
+
+        outputs = []
+        for i, (_, targets) in enumerate(chunk):
+            for dst, opts in targets:
+                if batch:
+                    cmd += ["-map", str(i)]
+                cmd += [*opts, *threads, str(dst)]
+                outputs.append(dst)
+
+        jobs.append(([src for src, _ in chunk], outputs, cmd))
+
+    return jobs
+
+
+def _progressbar(length: int, label: str):
+    # Redraw at most ~200 times per bar, and never write control codes into
+    # redirected output (logs, CI).
+    kwargs = dict(length=length, label=label, update_min_steps=max(1, length // 200))
+    if sys.stderr.isatty():
+        kwargs["file"] = sys.stderr
+    else:
+        kwargs["file"] = io.StringIO()
+    return click.progressbar(**kwargs)
+
+
+def _process_one(sources: List[Path], outputs: List[Path], cmd: List[str], dry_run: bool,
+                 on_progress: Optional[Callable[[int], None]] = None) -> Tuple[List[Path], List[Path], bool]:
+    # Runs on a worker thread: only on_progress and the in-flight set touch shared state.
+    if STOP_EVENT.is_set():
+        return sources, outputs, False
+
+    # Outputs that overwrite a source are never treated as partial files.
+    partial = {dst for dst in outputs if dst not in sources}
+    with CREATED_FILES_LOCK:
+        _IN_FLIGHT.update(partial)
+
+    try:
+        return sources, outputs, run_ffmpeg(cmd, dry_run, on_progress)
+    except Exception:
+        logging.exception("Worker failure: %s", sources)
+        return sources, outputs, False
+    finally:
+        with CREATED_FILES_LOCK:
+            _IN_FLIGHT.difference_update(partial)
+
+
+def run_batch(ctx: click.Context, jobs: List[Job], label: str, timed: bool = False,
+              split: Optional[Callable[[Job], List[Job]]] = None) -> Tuple[int, int]:
+    """
+    Run independent FFmpeg jobs on a thread pool (FFmpeg does the heavy
+    lifting, so threads are enough). Backups and cleanup registration stay
+    on the main thread.
+
+    With timed=True and ffprobe available, the bar advances by media
+    duration as FFmpeg reports progress instead of one tick per file.
+
+    When a job with several sources fails and split is given, its leftover
+    outputs are removed and split(job) is queued in its place, so one bad
+    input only fails itself.
+    """
+    ok = fail = 0
+    dry_run = ctx.obj["dry_run"]
+    ffprobe: Optional[Path] = ctx.obj["ffprobe"]
+    jobs = list(jobs)
+
+    weights = [len(sources) for sources, _, _ in jobs]
+    if timed and ffprobe is not None and not dry_run:
+        durations = [probe_duration_ms(ffprobe, src) for sources, _, _ in jobs for src in sources]
+        if all(durations) and len(durations) == len(jobs):
+            weights = durations
+        else:
+            timed = False
+    else:
+        timed = False
+
+    done = [0] * len(jobs)
+    bar_lock = threading.Lock()
+
+    def _advance(i: int, pos_ms: int) -> None:
+        with bar_lock:
+            pos = min(pos_ms, weights[i])
+            if pos > done[i]:
+                bar.update(pos - done[i])
+                done[i] = pos
+
+    # Outputs that already existed before a splittable job ran; never
+    # removed when cleaning up after it.
+    existed: Dict[int, Set[Path]] = {}
+
+    with _progressbar(sum(weights), label) as bar, \
+            ThreadPoolExecutor(max_workers=ctx.obj["jobs"]) as ex:
+
+        def _submit(i: int):
+            sources, outputs, cmd = jobs[i]
+            if split is not None and len(sources) > 1:
+                existed[i] = {dst for dst in outputs if path_exists(dst)}
+            return ex.submit(
+                _process_one, sources, outputs, cmd, dry_run,
+                functools.partial(_advance, i) if timed else None,
+            )
+
+        try:
+            futures = {_submit(i): i for i in range(len(jobs))}
+            pending = set(futures)
+
+            while pending:
+                finished, pending = wait(pending, return_when=FIRST_COMPLETED)
+                for fut in finished:
+                    i = futures.pop(fut)
+                    sources, outputs, success = fut.result()
+
+                    if not success and i in existed and not STOP_EVENT.is_set():
+                        click.secho(f"Batch of {len(sources)} failed, retrying one by one", fg="yellow")
+                        for dst in outputs:
+                            if dst not in sources and dst not in existed[i]:
+                                try:
+                                    os.unlink(dst)
+                                except FileNotFoundError:
+                                    pass
+
+                        # The retries carry this job's share of the bar.
+                        for job in split(jobs[i]):
+                            jobs.append(job)
+                            weights.append(len(job[0]))
+                            done.append(0)
+                            new = _submit(len(jobs) - 1)
+                            futures[new] = len(jobs) - 1
+                            pending.add(new)
+                        continue
+
+                    _advance(i, weights[i])
+
+                    if not success:
+                        fail += len(sources)
+                        continue
+
+                    track_created(*outputs)
+                    _index_update(added=outputs)
+                    for src in sources:
+                        try:
+                            backup_original(src)
+                            ok += 1
+                        except Exception:
+                            logging.exception("Post-processing failure: %s", src)
+                            fail += 1
+        except BaseException:
+            # Interrupted (the handler raises SystemExit here): drop queued
+            # jobs instead of letting the executor run them on the way out.
+            ex.shutdown(wait=False, cancel_futures=True)
+            raise
+
+    return ok, fail
+
+
+def run_image_plan(ctx: click.Context, plan: List[ImagePlan], batch: bool,
+                   label: str) -> Tuple[int, int]:
+    """Run an image plan; a failed --batch group is redone one image per FFmpeg."""
+    targets = dict(plan)
+
+    def _split(job: Job) -> List[Job]:
+        return build_image_jobs(ctx, [(src, targets[src]) for src in job[0]])
+
+    return run_batch(ctx, build_image_jobs(ctx, plan, batch), label,
+                     split=_split if batch else None)
+
 # ============================================================
 # Input Expansion (Windows-safe)
 # ============================================================
 
 def expand_inputs(inputs) -> List[Path]:
+    seen = set()
     results = []
 
+    def _add(p: Path) -> None:
+        if p not in seen:
+            seen.add(p)
+            results.append(p)
+
     for item in inputs:
-        matches = glob.glob(item)
-        if matches:
-            results.extend(matches)
-        else:
-            p = Path(item)
-            if p.exists():
-                results.append(str(p))
+        pattern = Path(item)
+        before = len(results)
+
+        # Literal paths skip pattern compilation and the directory scan entirely.
+        if glob.has_magic(pattern.name):
+            if glob.has_magic(str(pattern.parent)):
+                # Wildcards in directory parts: let glob walk them ("**" stays one level).
+                for match in glob.glob(item, recursive=False):
+                    _add(Path(match))
+            else:
+                # Compile once per pattern instead of once per directory entry.
+                matches = re.compile(fnmatch.translate(os.path.normcase(pattern.name))).match
+                hidden_ok = pattern.name.startswith(".")
+
+                # Single readdir; DirEntry caches file type, so no extra stat.
+                # The full listing also seeds _DIR_NAMES for output checks.
+                names = set()
+                try:
+                    with os.scandir(pattern.parent) as it:
+                        for entry in it:
+                            name = os.path.normcase(entry.name)
+                            names.add(name)
+                            if entry.name.startswith(".") and not hidden_ok:
+                                continue
+                            if matches(name) and entry.is_file():
+                                _add(Path(entry.path))
+                except OSError:
+                    pass
+                else:
+                    _DIR_NAMES.setdefault(pattern.parent, names)
+
+        # Literal path, or a name like "clip[1].mp4" that matched nothing as a pattern.
+        if len(results) == before and pattern.exists():
+            _add(pattern)
 
-    return list(dict.fromkeys(Path(p) for p in results))
+    return results
 
 
 # ============================================================
@@ -189,8 +791,17 @@ def expand_inputs(inputs) -> List[Path]:
 @click.group(context_settings=dict(help_option_names=[]))
 @click.option("--verbose", is_flag=True, help="Enable detailed logging to avicore.log")
 @click.option("--dry-run", is_flag=True, help="Preview commands without executing")
+@click.option("--jobs", type=click.IntRange(min=1), default=None,
+              help="Files processed in parallel  [default: CPUs / threads, else max-parallel]")
+@click.option("--threads", "--threads-per-job", "threads", type=click.IntRange(min=1), default=None,
+              help="FFmpeg threads given to each job  [default: CPUs / concurrent jobs]")
+@click.option("--max-parallel", type=click.IntRange(min=1), default=DEFAULT_MAX_PARALLEL,
+              show_default=True, help="Hard cap on concurrently running FFmpeg processes")
 @click.pass_context
-def cli(ctx: click.Context, verbose: bool, dry_run: bool) -> None:
+def cli(ctx: click.Context, verbose: bool, dry_run: bool,
+        jobs: Optional[int], threads: Optional[int], max_parallel: int) -> None:
+    global _FFMPEG_SEM
+
     setup_logging(verbose)
     register_cleanup()
 
@@ -199,10 +810,17 @@ def cli(ctx: click.Context, verbose: bool, dry_run: bool) -> None:
 
     ctx.obj = {
         "ffmpeg": ffmpeg,
+        "ffmpeg_s": str(ffmpeg),
+        "ffprobe": resolve_ffprobe(ffmpeg),
         "verbose": verbose,
         "dry_run": dry_run,
+        "jobs": jobs or default_jobs(threads, max_parallel),
+        "threads": threads,
+        "max_parallel": max_parallel,
     }
 
+    _FFMPEG_SEM = threading.BoundedSemaphore(ctx.obj["max_parallel"])
+
 # ============================================================
 # VERSION
 # ============================================================
@@ -222,6 +840,8 @@ USAGE:
   avicore image compress <files>
 
   avicore video convert <files> <format>
+  avicore video multi <files> <format> <format>...
+  avicore video multi-res <files> <height> <height>...
   avicore video mute <files>
 
   avicore audio convert <files> <format>
@@ -235,9 +855,18 @@ EXAMPLES:
  Compress all JPG images:
    avicore image compress "*.jpg"
 
+ Compress thousands of thumbnails, 64 per FFmpeg process:
+   avicore image compress "*.jpg" --batch
+
  Convert all MKV videos:
    avicore video convert "*.mkv" mp4
 
+ Convert MKV videos to MP4 and WEBM in one pass:
+   avicore video multi "*.mkv" mp4 webm
+
+ Render 1080p, 720p and 480p copies in one pass:
+   avicore video multi-res "*.mov" 1080 720 480
+
  Remove audio from videos:
    avicore video mute "*.mp4"
 
@@ -246,8 +875,11 @@ EXAMPLES:
 
 GLOBAL OPTIONS:
 
- --dry-run     Preview operations
- --verbose     Debug logging
+ --dry-run            Preview operations
+ --verbose            Debug logging
+ --jobs N             Files processed in parallel
+ --threads N          FFmpeg threads per job
+ --max-parallel N     Cap on simultaneous FFmpeg processes
 
 IMPORTANT:
 
@@ -265,13 +897,13 @@ IMPORTANT:
 @cli.group()
 def video(): pass
 
-@video.command(help="Convert video container.\nSafe default: libx264 + aac.\nUse --fast to stream-copy.")
+@video.command(help="Convert video container.\nStream-copies automatically when the source codecs fit the target,\notherwise re-encodes to libx264 + aac.\nUse --fast / --no-fast to force either.")
 @click.argument("input", nargs=-1)
 @click.argument("format")
-@click.option("--fast", is_flag=True, help="Use codec copy when compatible.")
+@click.option("--fast/--no-fast", default=None, help="Force codec copy / force re-encode  [default: auto]")
 @click.option("--force", is_flag=True)
 @click.pass_context
-def convert(ctx: click.Context, input: str, format: str, fast: bool, force: bool) -> None:
+def convert(ctx: click.Context, input: str, format: str, fast: Optional[bool], force: bool) -> None:
 
     if format.lower() not in VIDEO_FORMATS:
         raise click.ClickException("Unsupported video format")
@@ -280,39 +912,190 @@ def convert(ctx: click.Context, input: str, format: str, fast: bool, force: bool
     if not files:
         raise click.ClickException("No input files resolved")
 
-    ffmpeg: Path = ctx.obj["ffmpeg"]
-    dry_run = ctx.obj["dry_run"]
+    ffmpeg: str = ctx.obj["ffmpeg_s"]
 
-    ok = fail = 0
+    plan: List[Tuple[Path, Path, bool]] = []
+    planned = set()
+    skipped = 0
+
+    for src in files:
+        dst = src.with_name(src.stem + "." + format)
+
+        if (path_exists(dst) or dst in planned) and not force:
+            click.secho(f"Skipping existing file: {dst.name}", fg="yellow")
+            skipped += 1
+            continue
+
+        copy = fast if fast is not None else can_stream_copy(ctx.obj["ffprobe"], src, format.lower())
+
+        if copy and fast is None:
+            logging.debug("Auto stream-copy: %s", src)
+
+        planned.add(dst)
+        plan.append((src, dst, copy))
+
+    # Per-file argv only varies in the paths; build the rest once.
+    threads = thread_args(ctx, len(plan))
+    copy_args = ["-map", "0", "-c", "copy", *threads]
+    encode_args = [
+        "-map", "0",
+        "-c:v", "libx264",
+        "-c:a", "aac",
+        "-movflags", "+faststart",
+        *threads,
+    ]
+
+    jobs: List[Job] = [
+        ([src], [dst], [ffmpeg, "-i", str(src), *(copy_args if copy else encode_args), str(dst)])
+        for src, dst, copy in plan
+    ]
+
+    ok, fail = run_batch(ctx, jobs, "Converting videos", timed=True)
+    fail += skipped
+
+    click.secho(f"Completed → Success: {ok} | Failed: {fail}", fg="green")
+
+
+@video.command(help="Convert video(s) to several formats in one pass.\nEach source is decoded once.\nExample:\n avicore video multi \"*.mkv\" mp4 webm")
+@click.argument("args", nargs=-1, required=True, metavar="INPUT... FORMAT...")
+@click.option("--force", is_flag=True)
+@click.pass_context
+def multi(ctx: click.Context, args: Tuple[str, ...], force: bool) -> None:
 
-    with click.progressbar(files, label="Converting videos") as bar:
-        for src in bar:
+    # Trailing known formats are targets; everything before them is input.
+    split = len(args)
+    while split > 0 and args[split - 1].lower() in VIDEO_FORMATS:
+        split -= 1
 
-            dst = src.with_name(src.stem + "." + format)
+    inputs = args[:split]
+    formats = list(dict.fromkeys(f.lower() for f in args[split:]))
 
-            if dst.exists() and not force:
+    if not inputs or not formats:
+        raise click.ClickException("Usage: avicore video multi INPUT... FORMAT...")
+
+    files = expand_inputs(inputs)
+    if not files:
+        raise click.ClickException("No input files resolved")
+
+    ffmpeg: str = ctx.obj["ffmpeg_s"]
+
+    plan: List[Tuple[Path, List[Tuple[str, Path]]]] = []
+    planned = set()
+    skipped = 0
+
+    for src in files:
+        targets = []
+
+        for fmt in formats:
+            dst = src.with_name(src.stem + "." + fmt)
+
+            if (path_exists(dst) or dst in planned) and not force:
                 click.secho(f"Skipping existing file: {dst.name}", fg="yellow")
-                fail += 1
                 continue
 
-            if fast:
-                cmd = [str(ffmpeg), "-i", str(src), "-map", "0", "-c", "copy", str(dst)]
-            else:
-                cmd = [
-                    str(ffmpeg), "-i", str(src),
-                    "-map", "0",
-                    "-c:v", "libx264",
-                    "-c:a", "aac",
-                    "-movflags", "+faststart",
-                    str(dst),
-                ]
-
-            if run_ffmpeg(cmd, dry_run):
-                backup_original(src)
-                CREATED_FILES.append(dst)
-                ok += 1
-            else:
-                fail += 1
+            planned.add(dst)
+            targets.append((fmt, dst))
+
+        if not targets:
+            skipped += 1
+            continue
+
+        plan.append((src, targets))
+
+    # Output options per format, built once for the whole batch.
+    threads = thread_args(ctx, len(plan))
+    format_args = {}
+    for fmt in formats:
+        vcodec, acodec = VIDEO_CODECS[fmt]
+        format_args[fmt] = ["-map", "0", "-c:v", vcodec, "-c:a", acodec]
+        if fmt in ("mp4", "mov"):
+            format_args[fmt] += ["-movflags", "+faststart"]
+        format_args[fmt] += threads
+
+    jobs: List[Job] = []
+    for src, targets in plan:
+        cmd = [ffmpeg, "-i", str(src)]
+        for fmt, dst in targets:
+            cmd += [*format_args[fmt], str(dst)]
+        jobs.append(([src], [dst for _, dst in targets], cmd))
+
+    ok, fail = run_batch(ctx, jobs, "Converting videos", timed=True)
+    fail += skipped
+
+    click.secho(f"Completed → Success: {ok} | Failed: {fail}", fg="green")
+
+
+@video.command("multi-res", help="Render video(s) at several heights in one pass.\nEach source is decoded once and split across the scalers.\nExample:\n avicore video multi-res \"*.mov\" 1080 720 480")
+@click.argument("args", nargs=-1, required=True, metavar="INPUT... HEIGHT...")
+@click.option("--format", "fmt", type=click.Choice(sorted(VIDEO_FORMATS), case_sensitive=False),
+              default="mp4", show_default=True)
+@click.option("--force", is_flag=True)
+@click.pass_context
+def multi_res(ctx: click.Context, args: Tuple[str, ...], fmt: str, force: bool) -> None:
+
+    # Trailing integers are target heights; everything before them is input.
+    split = len(args)
+    while split > 0 and args[split - 1].isdigit():
+        split -= 1
+
+    inputs = args[:split]
+    heights = list(dict.fromkeys(int(h) for h in args[split:] if int(h) > 0))
+
+    if not inputs or not heights:
+        raise click.ClickException("Usage: avicore video multi-res INPUT... HEIGHT...")
+
+    files = expand_inputs(inputs)
+    if not files:
+        raise click.ClickException("No input files resolved")
+
+    fmt = fmt.lower()
+    ffmpeg: str = ctx.obj["ffmpeg_s"]
+    vcodec, acodec = VIDEO_CODECS[fmt]
+    out_args = ["-c:v", vcodec, "-c:a", acodec]
+    if fmt in ("mp4", "mov"):
+        out_args += ["-movflags", "+faststart"]
+
+    plan: List[Tuple[Path, List[Tuple[int, Path]]]] = []
+    planned = set()
+    skipped = 0
+
+    for src in files:
+        targets = []
+
+        for h in heights:
+            dst = src.with_name(f"{src.stem}_{h}p.{fmt}")
+
+            if (path_exists(dst) or dst in planned) and not force:
+                click.secho(f"Skipping existing file: {dst.name}", fg="yellow")
+                continue
+
+            planned.add(dst)
+            targets.append((h, dst))
+
+        if not targets:
+            skipped += 1
+            continue
+
+        plan.append((src, targets))
+
+    out_args += thread_args(ctx, len(plan))
+
+    jobs: List[Job] = []
+    for src, targets in plan:
+        # [0:v]split=N[v0][v1]...;[v0]scale=-2:H0[o0];[v1]scale=-2:H1[o1]...
+        n = len(targets)
+        graph = f"[0:v]split={n}" + "".join(f"[v{i}]" for i in range(n)) + ";" + ";".join(
+            f"[v{i}]scale=-2:{h}[o{i}]" for i, (h, _) in enumerate(targets)
+        )
+
+        cmd = [ffmpeg, "-i", str(src), "-filter_complex", graph]
+        for i, (_, dst) in enumerate(targets):
+            cmd += ["-map", f"[o{i}]", "-map", "0:a?", *out_args, str(dst)]
+
+        jobs.append(([src], [dst for _, dst in targets], cmd))
+
+    ok, fail = run_batch(ctx, jobs, "Rendering resolutions", timed=True)
+    fail += skipped
 
     click.secho(f"Completed → Success: {ok} | Failed: {fail}", fg="green")
 
@@ -327,36 +1110,26 @@ def mute(ctx: click.Context, input: str, force: bool) -> None:
     if not files:
         raise click.ClickException("No input files resolved")
 
-    ffmpeg: Path = ctx.obj["ffmpeg"]
-    dry_run = ctx.obj["dry_run"]
+    ffmpeg: str = ctx.obj["ffmpeg_s"]
 
-    ok = fail = 0
+    plan: List[Path] = []
+    skipped = 0
 
-    with click.progressbar(files, label="Muting videos") as bar:
-        for src in bar:
+    for src in files:
+        dst = src  # overwrite same filename
 
-            dst = src  # overwrite same filename
+        if path_exists(dst) and not force:
+            click.secho(f"Skipping existing file: {dst.name}", fg="yellow")
+            skipped += 1
+            continue
 
-            if dst.exists() and not force:
-                click.secho(f"Skipping existing file: {dst.name}", fg="yellow")
-                fail += 1
-                continue
+        plan.append(src)
 
-            cmd = [
-                str(ffmpeg), "-i", str(src),
-                "-map", "0",
-                "-an",
-                "-c:v", "copy",
-                "-c:s", "copy",
-                str(dst),
-            ]
+    mute_args = ["-map", "0", "-an", "-c:v", "copy", "-c:s", "copy", *thread_args(ctx, len(plan))]
+    jobs: List[Job] = [([src], [src], [ffmpeg, "-i", str(src), *mute_args, str(src)]) for src in plan]
 
-            if run_ffmpeg(cmd, dry_run):
-                backup_original(src)
-                CREATED_FILES.append(dst)
-                ok += 1
-            else:
-                fail += 1
+    ok, fail = run_batch(ctx, jobs, "Muting videos", timed=True)
+    fail += skipped
 
     click.secho(f"Completed → Success: {ok} | Failed: {fail}", fg="green")
 
@@ -372,9 +1145,10 @@ def image(): pass
 @image.command(help="Convert image(s).\nExample:\n avicore image convert *.png webp")
 @click.argument("pattern", nargs=-1)
 @click.argument("format")
+@click.option("--batch", is_flag=True, help="Convert many images per FFmpeg process.")
 @click.option("--force", is_flag=True)
 @click.pass_context
-def convert(ctx, pattern, format, force):
+def convert(ctx, pattern, format, batch, force):
     if format.lower() not in IMAGE_FORMATS:
         raise click.ClickException("Unsupported image format")
 
@@ -382,76 +1156,66 @@ def convert(ctx, pattern, format, force):
     if not files:
         raise click.ClickException("No input files resolved")
 
-    ffmpeg = ctx.obj["ffmpeg"]
-    dry_run = ctx.obj["dry_run"]
+    plan: List[ImagePlan] = []
+    planned = set()
 
-    ok = fail = 0
-
-    with click.progressbar(files, label="Converting images") as bar:
-        for src in bar:
-            original = src
-            dst = src.with_name(src.stem + "." + format)
+    for src in files:
+        dst = src.with_name(src.stem + "." + format)
 
-            if dst.exists() and not force:
-                dst = suggest_path(dst)
+        if (path_exists(dst) or dst in planned) and not force:
+            dst = suggest_path(dst, planned)
 
-            cmd = [str(ffmpeg), "-i", str(src), str(dst)]
+        planned.add(dst)
+        plan.append((src, [(dst, [])]))
 
-            if run_ffmpeg(cmd, dry_run):
-                backup_original(src)
-                CREATED_FILES.append(dst)
-                ok += 1
-            else:
-                fail += 1
+    ok, fail = run_image_plan(ctx, plan, batch, "Converting images")
 
     click.secho(f"Completed → Success: {ok} | Failed: {fail}", fg="green")
 
 
 @image.command(help="Compress images intelligently.\nExample:\n avicore image compress *.jpg --quality 70")
 @click.argument("pattern", nargs=-1)
-@click.option("--quality", default=60, show_default=True)
+@click.option("--quality", type=click.IntRange(0, 100, clamp=True), default=60, show_default=True)
+@click.option("--both", is_flag=True, help="Write a lossless PNG and a quality-tuned JPG in one pass.")
+@click.option("--batch", is_flag=True, help="Compress many images per FFmpeg process.")
 @click.option("--force", is_flag=True)
 @click.pass_context
-def compress(ctx: click.Context, pattern: str, quality: int, force: bool) -> None:
+def compress(ctx: click.Context, pattern: str, quality: int, both: bool, batch: bool, force: bool) -> None:
     files = expand_inputs(pattern)
     if not files:
         raise click.ClickException("No input files resolved.")
 
-    ffmpeg: Path = ctx.obj["ffmpeg"]
-    ok = 0
-    fail = 0
+    plan: List[ImagePlan] = []
+    planned = set()
 
-    with click.progressbar(files, label="Compressing images") as bar:
-        for src in bar:
-            try:
-                ext = src.suffix.lower()
-                dst = src
-                if dst.exists() and not force:
-                    dst = suggest_path(dst)
-
-                if ext == ".png":
-                    cmd = [
-                        str(ffmpeg), "-i", str(src),
-                        "-compression_level", "9",
-                        str(dst),
-                    ]
-                else:
-                    q = max(2, min(31, int((100 - quality) / 3)))
-                    cmd = [
-                        str(ffmpeg), "-i", str(src),
-                        "-q:v", str(q),
-                        str(dst),
-                    ]
-
-                if run_ffmpeg(cmd, ctx.obj["dry_run"]):
-                    backup_original(src)
-                    CREATED_FILES.append(dst)
-                    ok += 1
-                else:
-                    fail += 1
-            except Exception:
-                logging.exception("Image compress failure")
-                fail += 1
+    q = str(_Q_MAP[quality])
+
+    for src in files:
+        ext = src.suffix.lower()
+
+        if both:
+            # One decode, two encodes: lossless PNG + requantized JPG.
+            targets = [
+                (src.with_suffix(".png"), ["-compression_level", "9"]),
+                (src.with_suffix(".jpg"), ["-q:v", q]),
+            ]
+        elif ext == ".png":
+            targets = [(src, ["-compression_level", "9"])]
+        else:
+            targets = [(src, ["-q:v", q])]
+
+        outputs = []
+
+        for dst, opts in targets:
+            if (path_exists(dst) or dst in planned) and not force:
+                dst = suggest_path(dst, planned)
+
+            planned.add(dst)
+            outputs.append((dst, opts))
+
+        plan.append((src, outputs))
+
+    ok, fail = run_image_plan(ctx, plan, batch, "Compressing images")
 
     click.secho(f"Batch Report → Success: {ok}, Failed: {fail}", fg="yellow")
 
@@ -476,18 +1240,19 @@ def extract(ctx: click.Context, input: str, force: bool) -> None:
     if dst.exists() and not force:
         dst = suggest_path(dst)
 
-    ffmpeg: Path = ctx.obj["ffmpeg"]
+    ffmpeg: str = ctx.obj["ffmpeg_s"]
 
     # -vn = no video, -ab 192k = audio bitrate
     cmd = [
-        str(ffmpeg), "-i", str(src),
+        ffmpeg, "-i", str(src),
         "-vn", "-ab", "192k", "-map", "a",
+        *thread_args(ctx, 1),
         str(dst)
     ]
 
     if run_ffmpeg(cmd, ctx.obj["dry_run"]):
         backup_original(src)
-        CREATED_FILES.append(dst)
+        track_created(dst)
         click.secho(f"Extracted → {dst}", fg="green")
 
 @audio.command(help="Convert audio format.\n\nExample:\n  avicore audio convert input.wav mp3")
@@ -507,12 +1272,12 @@ def convert(ctx: click.Context, input: str, format: str, force: bool) -> None:
     if dst.exists() and not force:
         dst = suggest_path(dst)
 
-    ffmpeg: Path = ctx.obj["ffmpeg"]
-    cmd = [str(ffmpeg), "-i", str(src), str(dst)]
+    ffmpeg: str = ctx.obj["ffmpeg_s"]
+    cmd = [ffmpeg, "-i", str(src), *thread_args(ctx, 1), str(dst)]
 
     if run_ffmpeg(cmd, ctx.obj["dry_run"]):
         backup_original(src)
-        CREATED_FILES.append(dst)
+        track_created(dst)
         click.secho(f"Converted → {dst}", fg="green")
 
 # ============================================================